@@ -2,15 +2,32 @@ import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '../scripts')) # solução temporária já que chamar direto via .scripts causa erro de importação
 
+from contextlib import asynccontextmanager
 from config_database import engine, Base, SessionLocal
-from models import Book, User
-from insert_database import save_to_database
-from scrapping import scrape_books
-from utils import CategoryEnum
-from fastapi import FastAPI, Depends, HTTPException, status, Query
-
+from models import Book, User, BookImage, BookChange, CHANGE_FIELDS
+from insert_database import save_to_database, get_or_create_category_ids, init_database
+from images import process_book_images, image_path, IMAGES_DIR, THUMBNAILS_DIR, ALLOWED_CONTENT_TYPES
+from utils import get_category_id, get_category_name, list_categories, refresh_categories, get_cached_books, cache_books, get_books_generation
+from schema_pydantic import BookIds
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Header
+from fastapi.responses import FileResponse, Response
+
+
+BATCH_MAX_IDS = 10000 # limite de ids por requisição na busca em lote
+SQLITE_MAX_PARAMS = 900 # abaixo do limite antigo de 999 variáveis por query do SQLite
+CHANGES_MAX_LIMIT = 5000 # máximo de alterações por página do feed
+CHANGE_FIELD_NAMES = {code: field for field, code in CHANGE_FIELDS.items()}
+
+# A criação do schema roda uma vez no startup (e não no import dos módulos). Em deploy com a migração
+# feita antes (uv run python scripts/insert_database.py), SKIP_DB_INIT=1 evita o DDL em cada worker.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if os.getenv("SKIP_DB_INIT") != "1":
+        init_database()
+    yield
 
 app = FastAPI(
+    lifespan = lifespan,
     title = "API de consulta aos dados do site Books to Scrape",
     description = "API desenvolvida para consultar os dados extraídos do site Books to Scrape para o tech challenge da Fase 1 da Pós-tech Machine Learning Engineering da FIAP.",
     version= "1.0.0"
@@ -23,6 +40,35 @@ def get_database():
         yield db
     finally:
         db.close()
+
+# Monta a resposta do livro trocando o category_id pelo nome da categoria (vem do cache, sem JOIN)
+def serialize_book(book):
+    return {
+        "id": book.id,
+        "title": book.title,
+        "price": book.price,
+        "category": get_category_name(book.category_id),
+        "rating": book.rating,
+        "availability": book.availability,
+        "image_url": book.image_url
+    }
+
+# Monta a alteração do histórico decodificando o campo (e o category_id para o nome da categoria)
+def serialize_change(change):
+    field = CHANGE_FIELD_NAMES[change.field]
+    old_value, new_value = change.old_value, change.new_value
+    if field == "category_id":
+        field = "category"
+        old_value = get_category_name(int(old_value)) if old_value is not None else None
+        new_value = get_category_name(int(new_value)) if new_value is not None else None
+    return {
+        "cursor": change.id,
+        "book_id": change.book_id,
+        "field": field,
+        "old_value": old_value,
+        "new_value": new_value,
+        "changed_at": change.changed_at.isoformat()
+    }
     
 # Endpoint de teste para validar o banco de dados criado
 @app.post("/test-book")
@@ -47,10 +93,11 @@ def create_test_book(db: Base = Depends(get_database)):
     
     """  
     # Criar livro de teste
+    category_ids = get_or_create_category_ids(db, ["Ficção"])
     book = Book(
         title="Livro Teste",
         price=20.5,
-        category="Ficção",
+        category_id=category_ids["Ficção"],
         rating=4,
         availability="In Stock",
         image_url=None
@@ -58,16 +105,9 @@ def create_test_book(db: Base = Depends(get_database)):
     db.add(book)
     db.commit()
     db.refresh(book)
+    refresh_categories(db)
     
-    return {
-        "id": book.id,
-        "title": book.title,
-        "price": book.price,
-        "category": book.category,
-        "rating": book.rating,
-        "availability": book.availability,
-        "image_url": book.image_url
-    }
+    return serialize_book(book)
 
 # rota de inserir livros extraídos do site no banco de dados
 @app.post("/insert-books", 
@@ -79,7 +119,8 @@ def create_test_book(db: Base = Depends(get_database)):
                     "application/json": {
                         "example": {
                             "message": "3 livros processados.",
-                            "failures": "1 livro que apresentou falhas."
+                            "failures": "1 livro que apresentou falhas.",
+                            "changes": "2 alterações registradas no histórico."
                         }
                     }
                 }
@@ -102,7 +143,7 @@ def create_test_book(db: Base = Depends(get_database)):
             }
         }
     )
-async def insert_books(list_books: list[dict]):
+def insert_books(list_books: list[dict]): # síncrona: a ingestão bloqueia (SQLite e NumPy), então roda no threadpool
     """
     ### Descrição:
     Rota para inserir livros extraídos via scrapping no banco de dados.
@@ -118,6 +159,7 @@ async def insert_books(list_books: list[dict]):
     ### Retorno:
     - message: quantidade de livros processados
     - failures: quantidade de livros que apresentaram falhas e foram registrados
+    - changes: quantidade de alterações (livros novos e campos alterados) registradas no histórico
 
     ### Body JSON:
         {
@@ -134,7 +176,48 @@ async def insert_books(list_books: list[dict]):
     result = save_to_database(list_books)
     return {
         "message": f"{len(result['saved'])} livros processados.",
-        "failures": f"{len(result['failures'])} livros que apresentaram falhas."
+        "failures": f"{len(result['failures'])} livros que apresentaram falhas.",
+        "changes": f"{len(result['changes'])} alterações registradas no histórico."
+    }
+
+# rota para baixar as capas dos livros cadastrados para o storage local e gerar as miniaturas
+@app.post("/insert-images",
+          status_code=200,
+          responses={
+            200: {
+                "description": "Imagens processadas com sucesso.",
+                "content": {
+                    "application/json": {
+                        "example": {
+                            "message": "999 imagens processadas.",
+                            "failures": "1 imagem que apresentou falhas.",
+                            "thumbnails": "999 miniaturas geradas.",
+                            "thumbnail_failures": "1 miniatura que apresentou falhas."
+                        }
+                    }
+                }
+            }
+        }
+    )
+def insert_images(): # síncrona: o FastAPI roda no threadpool e o download não bloqueia o event loop
+    """
+    ### Descrição:
+    Rota para baixar as capas dos livros que ainda não possuem imagem armazenada.
+    Os downloads são feitos em paralelo, as imagens são deduplicadas pelo hash (sha256) do conteúdo
+    e as miniaturas são geradas em um pool de processos (requer o extra `images`, com Pillow).
+
+    ### Retorno:
+    - message: quantidade de imagens baixadas e vinculadas aos livros
+    - failures: quantidade de imagens que apresentaram falhas
+    - thumbnails: quantidade de miniaturas geradas
+    - thumbnail_failures: quantidade de miniaturas que apresentaram falhas (são tentadas de novo na próxima chamada)
+    """
+    result = process_book_images()
+    return {
+        "message": f"{len(result['saved'])} imagens processadas.",
+        "failures": f"{len(result['failures'])} imagens que apresentaram falhas.",
+        "thumbnails": f"{len(result['thumbnails'])} miniaturas geradas.",
+        "thumbnail_failures": f"{len(result['thumbnail_failures'])} miniaturas que apresentaram falhas."
     }
 
 # Rota para buscar livros por título e/ou categoria
@@ -187,8 +270,7 @@ async def insert_books(list_books: list[dict]):
 )
 async def search_books_items(
         title: str = Query(None, description="Título do livro - Ex: Under the Tuscan Sun"), # testando parametros personalizados na documentação
-        #category: str = Query(None, description="Categoria do livro - Ex: Fiction"), # testando parametros personalizados na documentação
-        category: CategoryEnum = Query(None, description="Categoria do livro - Ex: Fiction", ), # para adicionar o dropdown com as categorias
+        category: str = Query(None, description="Categoria do livro - Ex: Fiction (ver /api/v1/categories)"), # validada contra o cache da tabela categories
         db: Base = Depends(get_database)):
     """
         ### Descrição:
@@ -207,19 +289,25 @@ async def search_books_items(
     if not title and not category:
         raise HTTPException(status_code=400, detail="Informe pelo menos o título ou a categoria para realizar a busca.")
     
+    category_id = None
+    if category:
+        category_id = get_category_id(category)
+        if category_id is None:
+            raise HTTPException(status_code=422, detail="Categoria inválida. Consulte as categorias disponíveis em /api/v1/categories.")
+
     #vai montar a query dinamicamente conforme os parâmetros informados
     query = db.query(Book)
     if title:
         query = query.filter(Book.title.ilike(f"%{title}%"))
-    if category:
-        query = query.filter(Book.category == category.value)
+    if category_id is not None:
+        query = query.filter(Book.category_id == category_id)
 
     books = query.all()
 
     if len(books) > 0:
         return {
                  "total livros encontrados": len(books),
-                 "livros": books
+                 "livros": [serialize_book(book) for book in books]
             }
     raise HTTPException(status_code=404, detail="Nenhum livro encontrado com os parâmetros informados. Revise os dados e tente novamente.")
 
@@ -317,7 +405,7 @@ async def search_books_price_range(
     if len(filtered_books) > 0:
         return {
                  "total livros encontrados": len(filtered_books),
-                 "livros": filtered_books
+                 "livros": [serialize_book(book) for book in filtered_books]
             }
     raise HTTPException(status_code=404, detail="Nenhum livro encontrado com os preços informados. Revise os dados e tente novamente.")
 
@@ -393,7 +481,7 @@ async def search_books_rated(db: Base = Depends(get_database)):
     if len(top_rating_books) > 0:
         return {
                  "total livros encontrados": len(top_rating_books),
-                 "livros": top_rating_books
+                 "livros": [serialize_book(book) for book in top_rating_books]
             }
     raise HTTPException(status_code=404, detail="Nenhum livro encontrado com a avaliação informada. Revise os dados e tente novamente.")
 
@@ -466,7 +554,7 @@ async def get_books(db: Base = Depends(get_database)):
     if len(books) > 0:
         return {
             "total de livros": len(books),
-            "livros": books
+            "livros": [serialize_book(book) for book in books]
             }
     raise HTTPException(status_code=404, detail="Nenhum livro cadastrado. Faça a importação via scrapping e tente novamente.")
 
@@ -488,9 +576,310 @@ async def get_book_by_id(book_id: int, db: Base = Depends(get_database)):
     """
     book = db.query(Book).filter(Book.id == book_id).first()
     if book is not None:
-        return book
+        return serialize_book(book)
     raise HTTPException(status_code=422, detail="Item não encontrado, verifique o ID informado")
 
+# Rota para buscar vários livros pelo ID em uma única requisição
+@app.post("/api/v1/books/batch",
+          status_code=200,
+          responses={
+            200: {
+                "description": "Livros encontrados, na mesma ordem dos ids informados.",
+                "content": {
+                    "application/json": {
+                        "example": {
+                            "total livros encontrados": 2,
+                            "livros": [
+                                {
+                                    "id": 3,
+                                    "title": "See America: A Celebration of Our National Parks & Treasured Sites",
+                                    "price": 48.87,
+                                    "category": "Travel",
+                                    "rating": 3,
+                                    "availability": "In stock",
+                                    "image_url": "https://books.toscrape.com/media/cache/9a/7e/9a7e63f12829df4b43b31d110bf3dc2e.jpg"
+                                },
+                                {
+                                    "id": 1,
+                                    "title": "Livro Teste",
+                                    "price": 20.5,
+                                    "category": "Ficção",
+                                    "rating": 4,
+                                    "availability": "In Stock",
+                                    "image_url": None
+                                }
+                            ],
+                            "ids não encontrados": [5000]
+                        }
+                    }
+                }
+            },
+            400: {
+                "description": "Quantidade de ids inválida.",
+                "content": {
+                    "application/json": {
+                        "example": {
+                            "detail": "Informe entre 1 e 10000 ids para realizar a busca."
+                        }
+                    }
+                }
+            }
+        }
+    )
+async def get_books_batch(
+        body: BookIds,
+        cache: bool = Query(True, description="Usa o cache LRU por id dos livros"),
+        db: Base = Depends(get_database)):
+    """
+    ### Descrição:
+    Rota para buscar vários livros pelo ID de cadastro em uma única requisição.
+    Os ids são resolvidos com consultas `IN`, divididas em blocos abaixo do limite de parâmetros do SQLite.
+    ### Parâmetros:
+    - ids: list[int] (obrigatório, até 10000 ids)
+    - cache: bool (opcional, padrão true)
+
+    ### Retorno:
+    - livros: livros encontrados, na mesma ordem dos ids informados
+    - ids não encontrados: ids que não existem no banco de dados
+
+    ### Body JSON:
+        {
+            "ids": [3, 1, 5000]
+        }
+    """
+    if not 0 < len(body.ids) <= BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Informe entre 1 e {BATCH_MAX_IDS} ids para realizar a busca.")
+
+    unique_ids = list(dict.fromkeys(body.ids))
+    generation = get_books_generation(db) if cache else None
+    found = get_cached_books(unique_ids, generation) if cache else {}
+    pending = [book_id for book_id in unique_ids if book_id not in found]
+
+    loaded = []
+    for start in range(0, len(pending), SQLITE_MAX_PARAMS):
+        chunk = pending[start:start + SQLITE_MAX_PARAMS]
+        loaded.extend(serialize_book(book) for book in db.query(Book).filter(Book.id.in_(chunk)).all())
+    if cache:
+        cache_books(loaded, generation)
+    found.update((book["id"], book) for book in loaded)
+
+    return {
+        "total livros encontrados": sum(1 for book_id in body.ids if book_id in found),
+        "livros": [found[book_id] for book_id in body.ids if book_id in found],
+        "ids não encontrados": [book_id for book_id in unique_ids if book_id not in found]
+    }
+
+# Rota para retornar a capa armazenada de um livro (ou sua miniatura)
+@app.get("/api/v1/books/{book_id}/image",
+         status_code=200,
+         response_class=FileResponse,
+         responses={
+            200: {"description": "Imagem do livro.", "content": {"image/jpeg": {}}},
+            304: {"description": "Imagem não modificada (ETag informado em If-None-Match)."},
+            404: {
+                "description": "Imagem não encontrada para o livro informado.",
+                "content": {
+                    "application/json": {
+                        "example": {
+                            "detail": "Imagem não encontrada. Faça a importação das imagens e tente novamente."
+                        }
+                    }
+                }
+            }
+        }
+    )
+async def get_book_image(
+        book_id: int,
+        thumbnail: bool = Query(False, description="Retorna a miniatura em vez da imagem original"),
+        if_none_match: str = Header(None),
+        db: Base = Depends(get_database)):
+    """
+    ### Descrição:
+    Rota para retornar a capa de um livro a partir do storage local.
+    ### Parâmetros:
+    - BOOK_ID: int (obrigatório)
+    - thumbnail: bool (opcional, padrão false)
+
+    ### Retorno:
+    Arquivo da imagem. A capa de um livro pode mudar a cada ingestão, então o cliente pode guardar a resposta
+    mas deve revalidar com o ETag (hash do conteúdo) via If-None-Match, recebendo 304 se não mudou.
+    - Request URL: 'http://127.0.0.1:8000/api/v1/books/<book_id>/image?thumbnail=true'
+    """
+    image = db.query(BookImage).filter(BookImage.book_id == book_id).first()
+    if image is None:
+        raise HTTPException(status_code=404, detail="Imagem não encontrada. Faça a importação das imagens e tente novamente.")
+
+    if thumbnail:
+        path = image_path(image.sha256, THUMBNAILS_DIR)
+        media_type = "image/jpeg"
+        etag = f'"{image.sha256}-thumb"'
+    else:
+        path = image_path(image.sha256, IMAGES_DIR)
+        # registros antigos podem ter o Content-Type da origem: fora da lista, o navegador recebe como download
+        media_type = image.content_type if image.content_type in ALLOWED_CONTENT_TYPES else "application/octet-stream"
+        etag = f'"{image.sha256}"'
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, no-cache", # a URL é por livro, não pelo hash: sempre revalidar
+        "X-Content-Type-Options": "nosniff" # impede o navegador de tratar o arquivo como HTML/script
+    }
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Imagem não encontrada. Faça a importação das imagens e tente novamente.")
+    return FileResponse(path, media_type=media_type, headers=headers) # envia direto do disco (pathsend quando o servidor suporta)
+
+# Rota para retornar os livros mais parecidos com um livro específico
+@app.get("/api/v1/books/{book_id}/similar",
+         status_code=200,
+         responses={
+            200: {
+                "description": "Livros similares encontrados com sucesso.",
+                "content": {
+                    "application/json": {
+                        "example": {
+                            "livro": {
+                                "id": 3,
+                                "title": "See America: A Celebration of Our National Parks & Treasured Sites",
+                                "price": 48.87,
+                                "category": "Travel",
+                                "rating": 3,
+                                "availability": "In stock",
+                                "image_url": "https://books.toscrape.com/media/cache/9a/7e/9a7e63f12829df4b43b31d110bf3dc2e.jpg"
+                            },
+                            "similares": [
+                                {
+                                    "id": 4,
+                                    "title": "Vagabonding: An Uncommon Guide to the Art of Long-Term World Travel",
+                                    "price": 36.94,
+                                    "category": "Travel",
+                                    "rating": 2,
+                                    "availability": "In stock",
+                                    "image_url": "https://books.toscrape.com/media/cache/d5/bf/d5bf0090470b0b8ea46d9c166f7895aa.jpg",
+                                    "score": 0.6712
+                                }
+                            ]
+                        }
+                    }
+                }
+            },
+            422: {
+                "description": "Livro não encontrado.",
+                "content": {
+                    "application/json": {
+                        "example": {
+                            "detail": "Item não encontrado, verifique o ID informado"
+                        }
+                    }
+                }
+            }
+        }
+    )
+def get_similar_books( # síncrona: o cálculo com NumPy e a atualização do índice rodam no threadpool
+        book_id: int,
+        k: int = Query(5, description="Quantidade de livros similares", ge=1, le=50),
+        db: Base = Depends(get_database)):
+    """
+    ### Descrição:
+    Rota para buscar os livros mais parecidos com um livro específico (similaridade do cosseno entre vetores
+    de n-gramas do título, categoria, preço e avaliação, pré-calculados no índice atualizado a cada ingestão).
+    ### Parâmetros:
+    - BOOK_ID: int (obrigatório)
+    - k: int (opcional, de 1 a 50, padrão 5)
+
+    ### Retorno:
+    - livro: dados do livro informado
+    - similares: livros mais parecidos, do mais para o menos similar, com o score de similaridade
+    - Request URL: 'http://127.0.0.1:8000/api/v1/books/<book_id>/similar?k=5'
+    """
+    from similarity import most_similar, update_index # numpy só é carregado quando a rota é usada
+
+    book = db.query(Book).filter(Book.id == book_id).first()
+    if book is None:
+        raise HTTPException(status_code=422, detail="Item não encontrado, verifique o ID informado")
+
+    neighbours = most_similar(book_id, k)
+    if neighbours is None: # livro cadastrado fora da ingestão (ex: /test-book) ainda não está no índice
+        update_index([book_id])
+        neighbours = most_similar(book_id, k)
+
+    books = {b.id: b for b in db.query(Book).filter(Book.id.in_([i for i, _ in neighbours])).all()}
+    return {
+        "livro": serialize_book(book),
+        "similares": [
+            {**serialize_book(books[i]), "score": round(score, 4)}
+            for i, score in neighbours if i in books
+        ]
+    }
+
+# Rota do feed de alterações dos livros (preço, disponibilidade etc.), paginado por cursor
+@app.get("/api/v1/changes",
+         status_code=200,
+         responses={
+            200: {
+                "description": "Alterações registradas após o cursor informado.",
+                "content": {
+                    "application/json": {
+                        "example": {
+                            "total alterações": 2,
+                            "alterações": [
+                                {
+                                    "cursor": 1001,
+                                    "book_id": 2,
+                                    "field": "price",
+                                    "old_value": "49.43",
+                                    "new_value": "45.0",
+                                    "changed_at": "2026-10-19T12:00:00"
+                                },
+                                {
+                                    "cursor": 1002,
+                                    "book_id": 2,
+                                    "field": "availability",
+                                    "old_value": "In stock",
+                                    "new_value": "Out of stock",
+                                    "changed_at": "2026-10-19T12:00:00"
+                                }
+                            ],
+                            "próximo cursor": 1002,
+                            "possui mais": False
+                        }
+                    }
+                }
+            }
+        }
+    )
+async def get_changes(
+        since: int = Query(0, description="Cursor: valor de 'próximo cursor' da página anterior (0 para o início)", ge=0),
+        limit: int = Query(500, description="Quantidade máxima de alterações por página", ge=1, le=CHANGES_MAX_LIMIT),
+        db: Base = Depends(get_database)):
+    """
+    ### Descrição:
+    Rota para consumir o histórico de alterações dos livros de forma incremental, sem baixar o catálogo completo.
+    Cada linha representa um campo alterado em uma ingestão. Livros novos aparecem com field "created", seguido
+    de uma linha por campo preenchido com old_value nulo e o valor inicial em new_value.
+    Livros que já existiam antes do histórico (bancos migrados) não têm o evento "created": since=0 não é um
+    snapshot completo do catálogo, que deve ser carregado antes pelas rotas de livros.
+    ### Parâmetros:
+    - since: int (opcional, cursor da última alteração recebida)
+    - limit: int (opcional, de 1 a 5000, padrão 500)
+
+    ### Retorno:
+    - alterações: alterações em ordem de registro
+    - próximo cursor: valor para usar no since da próxima chamada
+    - possui mais: indica se há mais alterações após esta página
+    - Request URL: 'http://127.0.0.1:8000/api/v1/changes?since=<cursor>&limit=500'
+    """
+    changes = db.query(BookChange).filter(BookChange.id > since).order_by(BookChange.id).limit(limit + 1).all()
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    return {
+        "total alterações": len(changes),
+        "alterações": [serialize_change(change) for change in changes],
+        "próximo cursor": changes[-1].id if changes else since,
+        "possui mais": has_more
+    }
+
 # Rota para listar as categorias de livros disponíveis
 @app.get("/api/v1/categories", 
          status_code=200,
@@ -527,7 +916,7 @@ async def get_book_by_id(book_id: int, db: Base = Depends(get_database)):
             }
         }
     )
-async def get_categories(db: Base = Depends(get_database)):
+async def get_categories():
     """
     ### Descrição:
     Rota para para listar as categorias de livros disponíveis
@@ -537,8 +926,7 @@ async def get_categories(db: Base = Depends(get_database)):
     - categorias: listagem com categorias distintas
     
     """ 
-    categories = db.query(Book.category).distinct().all() # cria uma tupla (chave/valor) com as categorias
-    unique_categories = [c[0] for c in categories] # puxa os valores únicos da tupla retornada pelo distinct() 
+    unique_categories = list_categories() # vem do cache da tabela categories, sem DISTINCT sobre a tabela de livros
     if len(unique_categories) > 0:
         return {
             "total de categorias": len(unique_categories),
@@ -0,0 +1,54 @@
+# Compara a busca de livros um a um (GET /api/v1/books/{book_id}) com a busca em lote (POST /api/v1/books/batch).
+# Uso (na raiz do projeto, com o banco populado): uv run python benchmarks/bench_batch_lookup.py
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi.testclient import TestClient
+from app.main import app, BATCH_MAX_IDS
+from config_database import SessionLocal
+from models import Book
+from utils import clear_book_cache
+
+LOOKUPS = 10000
+
+
+def main():
+    session = SessionLocal()
+    all_ids = [row[0] for row in session.query(Book.id).all()]
+    session.close()
+    if not all_ids:
+        sys.exit("Banco vazio: faça a importação dos livros antes de rodar o benchmark.")
+
+    random.seed(42)
+    ids = [random.choice(all_ids) for _ in range(LOOKUPS)]
+    client = TestClient(app)
+
+    start = time.perf_counter()
+    for book_id in ids:
+        client.get(f"/api/v1/books/{book_id}")
+    single = time.perf_counter() - start
+
+    def run_batch(cache):
+        start = time.perf_counter()
+        for i in range(0, len(ids), BATCH_MAX_IDS):
+            client.post(f"/api/v1/books/batch?cache={str(cache).lower()}", json={"ids": ids[i:i + BATCH_MAX_IDS]})
+        return time.perf_counter() - start
+
+    batch_no_cache = run_batch(cache=False)
+    clear_book_cache()
+    batch_cold = run_batch(cache=True)
+    batch_warm = run_batch(cache=True)
+
+    print(f"{LOOKUPS} buscas")
+    print(f"  rota individual:         {single:8.3f}s")
+    print(f"  lote sem cache:          {batch_no_cache:8.3f}s ({single / batch_no_cache:.0f}x)")
+    print(f"  lote com cache (frio):   {batch_cold:8.3f}s ({single / batch_cold:.0f}x)")
+    print(f"  lote com cache (quente): {batch_warm:8.3f}s ({single / batch_warm:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Mede o índice de similaridade: build completo e atualização incremental a partir do banco, e latência
+# das consultas top-k no catálogo real e em catálogos sintéticos maiores.
+# Uso (na raiz do projeto, com o banco populado): uv run python benchmarks/bench_similarity.py
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../scripts'))
+
+import numpy as np
+from similarity import build_index, update_index, build_vectors, most_similar, _save_index, CATEGORY_BUCKETS
+
+QUERIES = 1000
+K = 10
+SYNTHETIC_SIZES = (10000, 50000)
+WORDS = "the of a and war love night house city secret life world girl dark last time story".split()
+
+
+def query_latency(ids, path):
+    most_similar(int(ids[0]), K, path) # carrega o índice em memória
+    timings = []
+    for book_id in random.sample(list(ids), min(QUERIES, len(ids))):
+        start = time.perf_counter()
+        most_similar(int(book_id), K, path)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    random.seed(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "book_vectors.npz")
+
+        start = time.perf_counter()
+        index = build_index(path)
+        build = time.perf_counter() - start
+        if len(index["ids"]) == 0:
+            sys.exit("Banco vazio: faça a importação dos livros antes de rodar o benchmark.")
+
+        start = time.perf_counter()
+        update_index([int(i) for i in random.sample(list(index["ids"]), min(10, len(index["ids"])))], path)
+        incremental = time.perf_counter() - start
+
+        p50, p95 = query_latency(index["ids"], path)
+        print(f"catálogo do banco ({len(index['ids'])} livros)")
+        print(f"  build completo:           {build * 1000:8.1f}ms")
+        print(f"  atualização de 10 livros: {incremental * 1000:8.1f}ms")
+        print(f"  consulta top-{K}: p50 {p50:.3f}ms | p95 {p95:.3f}ms")
+
+        for size in SYNTHETIC_SIZES:
+            rows = [
+                (i, " ".join(random.choices(WORDS, k=random.randint(2, 8))), random.randint(1, 50), random.uniform(10, 60), random.randint(1, 5))
+                for i in range(1, size + 1)
+            ]
+            start = time.perf_counter()
+            matrix = build_vectors(rows)
+            build = time.perf_counter() - start
+            synthetic_path = os.path.join(tmp, f"synthetic_{size}.npz")
+            _save_index(np.arange(1, size + 1, dtype=np.int64), matrix, CATEGORY_BUCKETS, synthetic_path)
+            p50, p95 = query_latency(np.arange(1, size + 1), synthetic_path)
+            print(f"catálogo sintético ({size} livros, {matrix.nbytes / 1e6:.0f}MB)")
+            print(f"  build completo:           {build * 1000:8.1f}ms")
+            print(f"  consulta top-{K}: p50 {p50:.3f}ms | p95 {p95:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
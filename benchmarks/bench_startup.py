@@ -0,0 +1,64 @@
+# Mede o tempo de import do app.main e o tempo até a primeira resposta (startup do lifespan + 1ª requisição),
+# cada rodada em um processo novo, e verifica se os módulos do scrapping entraram no caminho da API.
+# Uso (na raiz do projeto): uv run python benchmarks/bench_startup.py [--runs 5] [--max-import-ms 800]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# módulos que só o scrapping/pipeline de imagens deve carregar
+HEAVY_MODULES = ("requests", "bs4", "PIL", "scrapping")
+
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    client.get("/api/v1/categories")
+first_request = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - start) * 1000,
+    "first_request_ms": (first_request - start) * 1000,
+    "heavy_modules": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def run_once():
+    code = CHILD.format(root=ROOT, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-W", "ignore", "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de startup da API.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, help="falha (exit 1) se a mediana do import passar deste valor")
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r in results)
+    first_request_ms = statistics.median(r["first_request_ms"] for r in results)
+    heavy = sorted({m for r in results for m in r["heavy_modules"]})
+
+    print(f"{args.runs} rodadas (mediana)")
+    print(f"  import app.main:     {import_ms:8.1f}ms")
+    print(f"  primeira resposta:   {first_request_ms:8.1f}ms")
+    print(f"  módulos do scrapping carregados: {heavy or 'nenhum'}")
+
+    failed = bool(heavy)
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print(f"  ❌ import acima do limite de {args.max_import_ms}ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
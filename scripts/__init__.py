@@ -1,2 +1,2 @@
 from scripts.config_database import engine, Base, SessionLocal
-from scripts.models import Book, User
\ No newline at end of file
+from scripts.models import Book, User, Category
\ No newline at end of file
@@ -1,7 +1,8 @@
+import os
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-DATABASE_URL = "sqlite:///./books_production.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./books_production.db") # pode ser trocado por variável de ambiente (ex: nos testes)
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}) # será usado para permitir as queries.  
 
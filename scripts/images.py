@@ -0,0 +1,191 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from sqlalchemy import text
+
+from config_database import SessionLocal
+from models import Book, BookImage
+
+# Storage local endereçado por conteúdo: media/images/<2 primeiros chars do sha256>/<sha256>
+MEDIA_DIR = "./media"
+IMAGES_DIR = os.path.join(MEDIA_DIR, "images")
+THUMBNAILS_DIR = os.path.join(MEDIA_DIR, "thumbnails")
+
+DOWNLOAD_WORKERS = 8 # tamanho máximo do pool de downloads simultâneos
+DOWNLOAD_TIMEOUT = 10
+THUMBNAIL_SIZE = (128, 192)
+
+# Só aceitamos (e servimos) estes tipos: o Content-Type vindo da origem não é confiável
+ALLOWED_CONTENT_TYPES = ("image/jpeg", "image/png", "image/gif", "image/webp")
+PILLOW_CONTENT_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "GIF": "image/gif", "WEBP": "image/webp"}
+
+_thread_local = threading.local()
+
+
+def image_path(sha256, root=IMAGES_DIR):
+    return os.path.join(root, sha256[:2], sha256)
+
+
+# requests e Pillow são importados sob demanda para não pesar no startup da API, que só serve os arquivos
+def _load_pillow():
+    try:
+        from PIL import Image # Pillow é opcional (extra "images"); sem ele as miniaturas não são geradas
+    except ImportError:
+        return None
+    return Image
+
+
+# requests.Session não é thread-safe, então cada thread do pool mantém a sua (reaproveitando as conexões)
+def _get_session():
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        import requests
+        session = requests.Session()
+        _thread_local.session = session
+    return session
+
+
+# Confere se o conteúdo é mesmo uma imagem e retorna o content type. Com Pillow instalado o tipo vem do próprio
+# conteúdo (o header pode mentir); sem ele, vale apenas a lista de tipos permitidos.
+def check_image(content, content_type):
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type not in ALLOWED_CONTENT_TYPES:
+        raise ValueError(f"Content-Type não permitido: {content_type or 'ausente'}")
+
+    Image = _load_pillow()
+    if Image is None:
+        return content_type
+    try:
+        with Image.open(io.BytesIO(content)) as img:
+            img.verify()
+            image_format = img.format
+    except Exception as e:
+        raise ValueError(f"Conteúdo não é uma imagem válida: {e}")
+    if image_format not in PILLOW_CONTENT_TYPES:
+        raise ValueError(f"Formato de imagem não permitido: {image_format}")
+    return PILLOW_CONTENT_TYPES[image_format]
+
+
+def download_image(url, timeout=DOWNLOAD_TIMEOUT):
+    response = _get_session().get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.content, check_image(response.content, response.headers.get("Content-Type"))
+
+
+# Grava o conteúdo apenas se o hash ainda não existir no storage (deduplicação) e retorna o sha256
+def store_image(content, root=IMAGES_DIR):
+    sha256 = hashlib.sha256(content).hexdigest()
+    path = image_path(sha256, root)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp" # escrita atômica: quem ler nunca vê um arquivo pela metade
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    return sha256
+
+
+# Roda em outro processo (ProcessPoolExecutor), por isso recebe apenas caminhos
+def make_thumbnail(source_path, target_path, size=THUMBNAIL_SIZE):
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    tmp_path = f"{target_path}.{uuid.uuid4().hex}.tmp"
+    Image = _load_pillow()
+    with Image.open(source_path) as img:
+        img = img.convert("RGB")
+        img.thumbnail(size)
+        img.save(tmp_path, format="JPEG", quality=85)
+    os.replace(tmp_path, target_path)
+    return target_path
+
+
+def generate_thumbnails(hashes, images_dir=IMAGES_DIR, thumbnails_dir=THUMBNAILS_DIR, max_workers=None):
+    if _load_pillow() is None:
+        return {"generated": [], "failures": []}
+
+    pending = [h for h in set(hashes) if not os.path.exists(image_path(h, thumbnails_dir))]
+    generated = []
+    failures = []
+    if not pending:
+        return {"generated": generated, "failures": failures}
+
+    # spawn: a rota roda no threadpool do FastAPI e fazer fork de um processo com várias threads pode travar o filho
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {
+            pool.submit(make_thumbnail, image_path(h, images_dir), image_path(h, thumbnails_dir)): h
+            for h in pending
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+                generated.append(futures[future])
+            except Exception as e:
+                failures.append({"sha256": futures[future], "error": str(e)})
+    return {"generated": generated, "failures": failures}
+
+
+# Baixa as capas em paralelo (pool limitado) e devolve um registro por livro.
+# books: lista de dicts com "id" e "image_url"; URLs repetidas são baixadas uma única vez.
+def download_book_images(books, images_dir=IMAGES_DIR, max_workers=DOWNLOAD_WORKERS):
+    books_by_url = {}
+    for book in books:
+        if book.get("image_url"):
+            books_by_url.setdefault(book["image_url"], []).append(book["id"])
+
+    saved = []
+    failures = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(download_image, url): url for url in books_by_url}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                content, content_type = future.result()
+                sha256 = store_image(content, images_dir)
+            except Exception as e:
+                failures.extend({"book_id": book_id, "image_url": url, "error": str(e)} for book_id in books_by_url[url])
+                continue
+            saved.extend(
+                {"book_id": book_id, "sha256": sha256, "content_type": content_type, "size": len(content)}
+                for book_id in books_by_url[url]
+            )
+    return {"saved": saved, "failures": failures}
+
+
+def save_book_images(session, records):
+    if not records:
+        return
+    session.execute(text("""
+        INSERT OR REPLACE INTO book_images (book_id, sha256, content_type, size)
+        VALUES (:book_id, :sha256, :content_type, :size)
+    """), records)
+
+
+# Etapa completa: baixa as capas dos livros que ainda não têm imagem, grava no banco e gera as miniaturas que faltam
+def process_book_images(images_dir=IMAGES_DIR, thumbnails_dir=THUMBNAILS_DIR, max_workers=DOWNLOAD_WORKERS):
+    session = SessionLocal()
+    try:
+        rows = (
+            session.query(Book.id, Book.image_url)
+            .outerjoin(BookImage, BookImage.book_id == Book.id)
+            .filter(Book.image_url.isnot(None), BookImage.book_id.is_(None))
+            .all()
+        )
+        result = download_book_images([{"id": book_id, "image_url": url} for book_id, url in rows], images_dir, max_workers)
+        save_book_images(session, result["saved"])
+        session.commit()
+        # todas as imagens armazenadas: miniaturas que falharam ou foram puladas (sem Pillow) são geradas de novo
+        stored_hashes = [row[0] for row in session.query(BookImage.sha256).distinct().all()]
+    finally:
+        session.close()
+
+    thumbnails = generate_thumbnails(stored_hashes, images_dir, thumbnails_dir)
+    return {
+        "saved": result["saved"],
+        "failures": result["failures"],
+        "thumbnails": thumbnails["generated"],
+        "thumbnail_failures": thumbnails["failures"]
+    }
@@ -1,43 +1,196 @@
 from config_database import SessionLocal, Base, engine
-from models import Book,FailedBook
+from models import Book,FailedBook,Category,CHANGE_FIELDS
 from schema_pydantic import Books
+from utils import refresh_categories, clear_book_cache
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from datetime import datetime
-from sqlalchemy import text
+from sqlalchemy import text, MetaData
+from sqlalchemy.schema import CreateTable
 
 
-# Criar tabelas se não existirem.
-Base.metadata.create_all(bind=engine)
+# Converte bancos antigos, onde books.category guardava o nome da categoria, para a FK categories.id
+def migrate_book_categories(bind=None):
+    with (bind or engine).begin() as conn:
+        columns = [row[1] for row in conn.execute(text("PRAGMA table_info(books)"))]
+        if "category" not in columns or "category_id" in columns:
+            return
+
+        conn.execute(text("""
+            INSERT OR IGNORE INTO categories (name)
+            SELECT category FROM books GROUP BY category ORDER BY MIN(id)
+        """))
+        # Procedimento do SQLite para alterar tabela: cria books_new, copia, remove books e renomeia books_new.
+        # Renomear a tabela antiga faria o SQLite reescrever as FKs de book_images/book_changes para ela.
+        metadata = MetaData()
+        Category.__table__.to_metadata(metadata)
+        books_new = Book.__table__.to_metadata(metadata, name="books_new")
+        conn.execute(CreateTable(books_new))
+        conn.execute(text("""
+            INSERT INTO books_new (id, title, price, category_id, rating, availability, image_url)
+            SELECT b.id, b.title, b.price, c.id, b.rating, b.availability, b.image_url
+            FROM books b JOIN categories c ON c.name = b.category
+        """))
+        conn.execute(text("DROP TABLE books")) # remove junto o índice antigo ix_books_id
+        conn.execute(text("ALTER TABLE books_new RENAME TO books"))
+        for index in Book.__table__.indexes:
+            index.create(bind=conn)
+
+
+# Cria as tabelas que não existirem e aplica as migrações. Não roda mais no import: é chamada no lifespan
+# da API (pode ser desligado com SKIP_DB_INIT=1) ou como etapa explícita: uv run python scripts/insert_database.py
+def init_database(bind=None):
+    Base.metadata.create_all(bind=bind or engine)
+    migrate_book_categories(bind)
+
+
+# Garante que todas as categorias existam na tabela e retorna o mapa nome -> id
+def get_or_create_category_ids(session, names):
+    names = {name for name in names if name}
+    if not names:
+        return {}
+    session.execute(text("INSERT OR IGNORE INTO categories (name) VALUES (:name)"), [{"name": name} for name in names])
+    rows = session.query(Category.id, Category.name).filter(Category.name.in_(names)).all()
+    return {name: category_id for category_id, name in rows}
+
+
+TRACKED_FIELDS = ("title", "price", "category_id", "rating", "availability", "image_url")
+
+
+def _encode_value(value):
+    return None if value is None else str(value)
+
+
+# Carrega os valores atuais dos livros informados, em blocos abaixo do limite de parâmetros do SQLite
+def get_current_books(session, ids):
+    current = {}
+    for start in range(0, len(ids), 900):
+        chunk = ids[start:start + 900]
+        columns = [Book.id] + [getattr(Book, field) for field in TRACKED_FIELDS]
+        for row in session.query(*columns).filter(Book.id.in_(chunk)).all():
+            current[row[0]] = dict(zip(TRACKED_FIELDS, row[1:]))
+    return current
+
+
+# Compara os livros recebidos com os valores atuais: separa novos e alterados e monta as linhas do histórico
+def diff_books(current, rows, changed_at):
+    new_rows = {}
+    changed_rows = {}
+    changes = []
+    for row in rows:
+        book_id = row["id"]
+        old = current.get(book_id)
+        if old is None:
+            new_rows[book_id] = row
+            # o evento de criação leva os valores iniciais: a linha "created" e uma linha por campo preenchido
+            changes.append({"book_id": book_id, "field": CHANGE_FIELDS["created"], "old_value": None, "new_value": None, "changed_at": changed_at})
+            changes.extend(
+                {"book_id": book_id, "field": CHANGE_FIELDS[field], "old_value": None, "new_value": _encode_value(row[field]), "changed_at": changed_at}
+                for field in TRACKED_FIELDS if row[field] is not None
+            )
+        else:
+            changed = False
+            for field in TRACKED_FIELDS:
+                if old[field] != row[field]:
+                    changes.append({
+                        "book_id": book_id,
+                        "field": CHANGE_FIELDS[field],
+                        "old_value": _encode_value(old[field]),
+                        "new_value": _encode_value(row[field]),
+                        "changed_at": changed_at
+                    })
+                    changed = True
+            if not changed:
+                continue
+            if book_id in new_rows:
+                new_rows[book_id] = row
+            else:
+                changed_rows[book_id] = row
+        current[book_id] = {field: row[field] for field in TRACKED_FIELDS} # ids repetidos no mesmo lote comparam com a última versão
+    return list(new_rows.values()), list(changed_rows.values()), changes
+
 
 def save_to_database(books_list):
     session = SessionLocal()
     saved_books = []
     failures = []
+    changes = []
+    new_rows = []
+    changed_rows = []
 
-    for book in books_list:
-        try:
-            # INSERT OR IGNORE: não adiciona se o ID já existir
-            sql = text("""
-                INSERT OR IGNORE INTO books (id, title, price, category, rating, availability, image_url)
-                VALUES (:id, :title, :price, :category, :rating, :availability, :image_url)
-            """)
-            session.execute(sql, {
-                "id": book["id"],
-                "title": book["title"],
-                "price": book["price"],
-                "category": book["category"],
-                "rating": book["rating"],
-                "availability": book["availability"],
-                "image_url": book["image_url"]
+    try:
+        validated_books = []
+        for book in books_list:
+            try:
+                # valida e converte os tipos (ex: price "36.94" -> 36.94) antes de comparar com os valores do banco
+                validated = Books(**book)
+                if not validated.category:
+                    raise ValueError("category não pode ser vazia")
+                validated_books.append((book, validated))
+            except Exception as e:
+                failures.append({"book": book, "error": str(e)})
+
+        # só cria as categorias dos livros que passaram na validação
+        category_ids = get_or_create_category_ids(session, [validated.category for _, validated in validated_books])
+
+        rows = []
+        for book, validated in validated_books:
+            rows.append({
+                "id": validated.id,
+                "title": validated.title,
+                "price": validated.price,
+                "category_id": category_ids[validated.category],
+                "rating": validated.rating,
+                "availability": validated.availability,
+                "image_url": validated.image_url
             })
             saved_books.append(book)
-        except Exception as e:
-            failures.append({"book": book, "error": str(e)})
 
-    session.commit()
-    session.close()
+        # Em vez de INSERT OR IGNORE, compara com os valores atuais: livros novos são inseridos, alterados são
+        # atualizados e cada campo alterado vira uma linha no histórico (book_changes), tudo em lote
+        current = get_current_books(session, list({row["id"] for row in rows}))
+        new_rows, changed_rows, changes = diff_books(current, rows, datetime.utcnow())
+        image_changed_ids = [change["book_id"] for change in changes if change["field"] == CHANGE_FIELDS["image_url"]]
+        try:
+            if new_rows:
+                session.execute(text("""
+                    INSERT INTO books (id, title, price, category_id, rating, availability, image_url)
+                    VALUES (:id, :title, :price, :category_id, :rating, :availability, :image_url)
+                """), new_rows)
+            if changed_rows:
+                session.execute(text("""
+                    UPDATE books SET title = :title, price = :price, category_id = :category_id, rating = :rating,
+                        availability = :availability, image_url = :image_url
+                    WHERE id = :id
+                """), changed_rows)
+            if image_changed_ids:
+                # a capa mudou: remove o vínculo para o pipeline de imagens baixar a nova
+                session.execute(text("DELETE FROM book_images WHERE book_id = :book_id"), [{"book_id": book_id} for book_id in image_changed_ids])
+            if changes:
+                session.execute(text("""
+                    INSERT INTO book_changes (book_id, field, old_value, new_value, changed_at)
+                    VALUES (:book_id, :field, :old_value, :new_value, :changed_at)
+                """), changes)
+            session.commit()
+        except SQLAlchemyError as e:
+            # a escrita é em lote: se falhar, nenhum livro do lote é gravado e todos entram nas falhas
+            session.rollback()
+            failures.extend({"book": book, "error": str(e)} for book in saved_books)
+            saved_books, changes, new_rows, changed_rows = [], [], [], []
+
+        refresh_categories(session) # atualiza o cache de categorias usado na validação da API
+        clear_book_cache()
+    finally:
+        session.close()
+
+    from similarity import update_index # numpy só é carregado no caminho de ingestão
+    update_index([row["id"] for row in new_rows + changed_rows]) # atualiza só as linhas dos livros novos ou alterados no índice de similaridade
 
     return {
         "saved": saved_books,
-        "failures": failures
-    }
\ No newline at end of file
+        "failures": failures,
+        "changes": changes
+    }
+
+
+if __name__ == "__main__":
+    init_database()
@@ -1,8 +1,16 @@
-from sqlalchemy import Column, Integer, String, Float, Text, DateTime
+from sqlalchemy import Column, Integer, SmallInteger, String, Float, Text, DateTime, ForeignKey
 from datetime import datetime
 from config_database import Base
 
 
+# Tabela normalizada de categorias, populada durante a ingestão (substitui o CategoryEnum estático)
+class Category(Base):
+    __tablename__ = "categories"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, unique=True, nullable=False)
+
+
 # Vai criar a tabela dos livros que vem do scrapping (validação com dados do pydantic)
 class Book(Base):
     __tablename__ = "books"
@@ -10,11 +18,36 @@ class Book(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     price = Column(Float, nullable=False)
-    category = Column(String, nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False, index=True) # FK inteira em vez do nome repetido em cada linha
     rating = Column(Integer, nullable=True) # rating será opicional
     availability = Column(String, nullable=True) # availability será opicional
     image_url = Column(String, nullable=True) # image_url  será opicional
 
+# Capa do livro baixada pelo pipeline de imagens. O arquivo fica no storage local endereçado pelo sha256 do conteúdo,
+# então livros com a mesma capa compartilham o mesmo arquivo
+class BookImage(Base):
+    __tablename__ = "book_images"
+
+    book_id = Column(Integer, ForeignKey("books.id"), primary_key=True)
+    sha256 = Column(String(64), nullable=False, index=True)
+    content_type = Column(String, nullable=False)
+    size = Column(Integer, nullable=False) # tamanho em bytes da imagem original
+
+# Códigos dos campos no histórico de alterações ("created" marca a primeira ingestão do livro)
+CHANGE_FIELDS = {"created": 0, "title": 1, "price": 2, "category_id": 3, "rating": 4, "availability": 5, "image_url": 6}
+
+# Histórico append-only das alterações por campo dos livros, gravado em lote pela ingestão.
+# O id crescente é o cursor do feed /api/v1/changes
+class BookChange(Base):
+    __tablename__ = "book_changes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    book_id = Column(Integer, ForeignKey("books.id"), nullable=False, index=True)
+    field = Column(SmallInteger, nullable=False) # código do campo em CHANGE_FIELDS
+    old_value = Column(String, nullable=True)
+    new_value = Column(String, nullable=True)
+    changed_at = Column(DateTime, nullable=False)
+
 class FailedBook(Base):
     __tablename__ = "failed_books"
     
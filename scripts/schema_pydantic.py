@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
 # vai validar o schema a partir dos dados exportados via scrapping (validar depois com arquivo final) 
@@ -7,13 +8,17 @@ class Books(BaseModel):
     title: str
     price: float
     category: str
-    rating: int = None
-    availability: str = None
-    image_url: str = None
+    rating: Optional[int] = None
+    availability: Optional[str] = None
+    image_url: Optional[str] = None
     
     class Config:
         orm_mode = True # orm_mode = True permite converter objetos SQLAlchemy direto para Pydantic.
 
+# corpo da busca em lote de livros por id
+class BookIds(BaseModel):
+    ids: list[int]
+
 # valida a criação do usuário no banco e depois vai hashear a senha para melhorar a segurança
 class CreateUser(BaseModel):
     username: str
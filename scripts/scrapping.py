@@ -1,24 +1,59 @@
+import argparse
 import requests
 from bs4 import BeautifulSoup
 import re
+import time
 import unicodedata
+from telemetry import CrawlTelemetry, PROFILERS
 
 # URLs base
 BASE_URL = "https://books.toscrape.com/"
 CATALOGUE_URL = BASE_URL + "catalogue/"
 
+REQUEST_TIMEOUT = 30
+MAX_RETRIES = 3 # tentativas extras em erro de conexão, timeout ou 5xx
+RETRY_BACKOFF = 0.5 # segundos, dobra a cada tentativa
+
 # Map rating
 RATING_MAP = {"One": 1, "Two": 2, "Three": 3, "Four": 4, "Five": 5}
 
+# O link do produto termina com o id do site (ex: .../a-light-in-the-attic_1000/index.html), que não muda
+# entre crawls; usar a posição no crawl faria um livro novo deslocar o id de todos os seguintes
+PRODUCT_ID_PATTERN = re.compile(r"_(\d+)/index\.html$")
+
 
 def clean_text(text):
     text = text.strip() # remove espaços extras 
     text = unicodedata.normalize('NFKD', text) # normaliza caracteres Unicode
     return text     
 
-def get_soup(url: str):
-    response = requests.get(url)
+# Faz o GET com retries. Se receber a página da telemetria, registra retries, o tempo até o servidor
+# responder os headers (response.elapsed, que inclui DNS/TCP/TLS quando a conexão é nova), os bytes que
+# vieram pela rede (response.raw.tell(), ainda comprimidos) e o tamanho do corpo já descomprimido
+def fetch(url: str, page=None):
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = requests.get(url, timeout=REQUEST_TIMEOUT)
+            if response.status_code < 500 or attempt == MAX_RETRIES:
+                break
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == MAX_RETRIES:
+                raise
+        if page is not None:
+            page["retries"] += 1
+        time.sleep(RETRY_BACKOFF * 2 ** attempt)
+
     response.raise_for_status()
+    if page is not None:
+        page["server_s"] += response.elapsed.total_seconds()
+        body = response.content # lê o corpo inteiro antes de consultar o contador da conexão
+        page["bytes"] += response.raw.tell()
+        page["body_bytes"] += len(body)
+    return response
+
+
+def get_soup(url: str):
+    response = fetch(url)
     return BeautifulSoup(response.text, "html.parser")
 
 
@@ -33,6 +68,11 @@ def get_categories():
     return categories
 
 
+def get_book_id(href):
+    match = PRODUCT_ID_PATTERN.search(href)
+    return int(match.group(1)) if match else None # sem id o livro é rejeitado na validação e vai para as falhas
+
+
 def extract_books_from_page(soup, category_name):
     books = []
     for book in soup.select("article.product_pod"):
@@ -49,6 +89,7 @@ def extract_books_from_page(soup, category_name):
         image_url = BASE_URL + book.img["src"].replace("../", "")
 
         books.append({
+            "id": get_book_id(book.h3.a["href"]),
             "title": title,
             "price": price,
             "rating": rating,
@@ -60,9 +101,16 @@ def extract_books_from_page(soup, category_name):
 
 
 
-def scrape_books():
+# telemetry: CrawlTelemetry opcional para coletar as métricas por página (fetch, parse, store)
+# save_pages: grava cada página no banco logo após extraí-la (fase "store" da telemetria)
+def scrape_books(telemetry=None, save_pages=False):
+    if telemetry is None:
+        telemetry = CrawlTelemetry()
+    if save_pages:
+        from insert_database import save_to_database, init_database
+        init_database()
+
     all_books = []
-    book_id = 1
     categories = get_categories()
     if not categories:
         categories = {"Unknown": BASE_URL}
@@ -71,14 +119,19 @@ def scrape_books():
         page_url = category_url
         while page_url:
             print(f"📖 Extraindo {category_name} - {page_url}")
-            soup = get_soup(page_url)
-            books = extract_books_from_page(soup, category_name)
-
-            for b in books:
-                b['id'] = book_id
-                book_id += 1
+            page = telemetry.start_page(page_url, category_name)
+            with telemetry.span(page, "fetch"):
+                response = fetch(page_url, page)
+            with telemetry.span(page, "parse"):
+                soup = BeautifulSoup(response.text, "html.parser")
+                books = extract_books_from_page(soup, category_name)
+            page["books"] = len(books)
             all_books.extend(books)
 
+            if save_pages:
+                with telemetry.span(page, "store"):
+                    save_to_database(books)
+
             next_btn = soup.select_one("li.next a")
             if next_btn:
                 next_page = next_btn['href']
@@ -86,3 +139,23 @@ def scrape_books():
             else:
                 page_url = None
     return all_books
+
+
+# Uso: uv run python scripts/scrapping.py --save --profile cprofile --report crawl_report.json
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrapping do site Books to Scrape com telemetria do crawl.")
+    parser.add_argument("--save", action="store_true", help="grava cada página no banco de dados")
+    parser.add_argument("--profile", choices=PROFILERS, help="ativa o profiler durante o crawl")
+    parser.add_argument("--profile-output", help="arquivo de saída do profiler (.prof para cprofile, .html para pyinstrument)")
+    parser.add_argument("--report", help="caminho do relatório JSON do crawl")
+    args = parser.parse_args()
+
+    telemetry = CrawlTelemetry(profiler=args.profile, profile_output=args.profile_output)
+    telemetry.start()
+    try:
+        scrape_books(telemetry=telemetry, save_pages=args.save)
+    finally:
+        telemetry.finish()
+        telemetry.print_report()
+        if args.report:
+            telemetry.write_json(args.report)
@@ -0,0 +1,197 @@
+import os
+import threading
+import uuid
+import zlib
+
+import numpy as np
+from filelock import FileLock
+
+from config_database import SessionLocal
+from models import Book
+
+# Índice de similaridade dos livros: uma matriz NumPy (float32) com uma linha por livro, normalizada (L2)
+# para que o produto escalar seja a similaridade do cosseno. Cada linha junta os blocos:
+# - título: n-gramas de caracteres com hashing trick (dimensão fixa, permite atualizar só os livros novos)
+# - categoria: one-hot do category_id, em um bloco com uma posição por categoria (potência de 2, mínimo
+#   CATEGORY_BUCKETS). O tamanho fica gravado no arquivo; uma categoria que não cabe força a reconstrução.
+# - preço e avaliação: valores escalados para 0..1
+INDEX_PATH = "./book_vectors.npz"
+
+NGRAM_SIZE = 3
+TITLE_FEATURES = 2048
+CATEGORY_BUCKETS = 128
+PRICE_SCALE = 100.0
+MAX_RATING = 5.0
+
+TITLE_WEIGHT = 1.0
+CATEGORY_WEIGHT = 0.6
+PRICE_WEIGHT = 0.3
+RATING_WEIGHT = 0.3
+
+_index_lock = threading.Lock()
+_index = None # {"ids": np.ndarray, "matrix": np.ndarray, "category_buckets": int, "positions": dict, "path": str, "mtime": float}
+
+
+def _title_ngrams(title):
+    text = f" {title.lower()} "
+    return [zlib.crc32(text[i:i + NGRAM_SIZE].encode()) % TITLE_FEATURES for i in range(max(1, len(text) - NGRAM_SIZE + 1))]
+
+
+# Tamanho do bloco de categorias que comporta todos os category_id informados
+def category_buckets_for(category_ids):
+    buckets = CATEGORY_BUCKETS
+    while max(category_ids, default=0) >= buckets:
+        buckets *= 2
+    return buckets
+
+
+# Monta os vetores de uma lista de tuplas (id, title, category_id, price, rating)
+def build_vectors(rows, category_buckets=CATEGORY_BUCKETS):
+    matrix = np.zeros((len(rows), TITLE_FEATURES + category_buckets + 2), dtype=np.float32)
+    if not rows:
+        return matrix
+
+    title_rows = []
+    title_cols = []
+    for i, (_, title, _, _, _) in enumerate(rows):
+        ngrams = _title_ngrams(title or "")
+        title_rows.extend([i] * len(ngrams))
+        title_cols.extend(ngrams)
+    title_block = matrix[:, :TITLE_FEATURES]
+    np.add.at(title_block, (np.array(title_rows), np.array(title_cols)), 1.0)
+    np.log1p(title_block, out=title_block) # tf sublinear, evita que títulos longos dominem
+    norms = np.linalg.norm(title_block, axis=1, keepdims=True)
+    np.divide(title_block, norms, out=title_block, where=norms > 0)
+    title_block *= TITLE_WEIGHT
+
+    positions = np.arange(len(rows))
+    category_ids = np.array([row[2] or 0 for row in rows])
+    if category_ids.max() >= category_buckets:
+        raise ValueError(f"category_id {category_ids.max()} não cabe em {category_buckets} posições")
+    matrix[positions, TITLE_FEATURES + category_ids] = CATEGORY_WEIGHT
+    matrix[:, -2] = PRICE_WEIGHT * np.clip(np.array([row[3] or 0 for row in rows], dtype=np.float32) / PRICE_SCALE, 0, 1)
+    matrix[:, -1] = RATING_WEIGHT * np.array([row[4] or 0 for row in rows], dtype=np.float32) / MAX_RATING
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def _load_rows(session, book_ids=None):
+    query = session.query(Book.id, Book.title, Book.category_id, Book.price, Book.rating)
+    if book_ids is not None:
+        query = query.filter(Book.id.in_(book_ids))
+    return query.order_by(Book.id).all()
+
+
+def _save_index(ids, matrix, category_buckets, path):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.npz" # np.savez exige a extensão .npz; os.replace deixa a troca atômica
+    np.savez(tmp_path, ids=ids, matrix=matrix, category_buckets=category_buckets)
+    os.replace(tmp_path, path)
+
+
+def _set_index(ids, matrix, category_buckets, path):
+    global _index
+    index = {
+        "ids": ids,
+        "matrix": matrix,
+        "category_buckets": int(category_buckets),
+        "positions": {int(book_id): i for i, book_id in enumerate(ids)},
+        "path": path,
+        "mtime": os.path.getmtime(path),
+    }
+    _index = index
+    return index
+
+
+# Trava entre processos (API, scrapper) e threads: quem escreve o índice lê o banco e o arquivo dentro dela,
+# então duas ingestões simultâneas não sobrescrevem as linhas uma da outra
+def _write_lock(path):
+    return FileLock(f"{path}.lock")
+
+
+def _build_index(path):
+    session = SessionLocal()
+    try:
+        rows = _load_rows(session)
+    finally:
+        session.close()
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    category_buckets = category_buckets_for([row[2] or 0 for row in rows])
+    matrix = build_vectors(rows, category_buckets)
+    _save_index(ids, matrix, category_buckets, path)
+    return _set_index(ids, matrix, category_buckets, path)
+
+
+def build_index(path=INDEX_PATH):
+    with _index_lock, _write_lock(path):
+        return _build_index(path)
+
+
+# Atualização incremental: recalcula apenas as linhas dos livros informados (novos ou alterados)
+def update_index(book_ids, path=INDEX_PATH):
+    book_ids = list(set(book_ids))
+    if not book_ids:
+        return get_index(path)
+
+    with _index_lock, _write_lock(path):
+        if not os.path.exists(path):
+            return _build_index(path)
+        with np.load(path) as data:
+            if "category_buckets" not in data: # arquivo de uma versão anterior
+                return _build_index(path)
+            ids, matrix, category_buckets = data["ids"], data["matrix"], int(data["category_buckets"])
+
+        session = SessionLocal()
+        try:
+            rows = []
+            for start in range(0, len(book_ids), 900): # abaixo do limite de parâmetros do SQLite
+                rows.extend(_load_rows(session, book_ids[start:start + 900]))
+        finally:
+            session.close()
+        if category_buckets_for([row[2] or 0 for row in rows]) > category_buckets:
+            return _build_index(path) # categoria nova fora do bloco: todas as linhas mudam de dimensão
+
+        positions = {int(book_id): i for i, book_id in enumerate(ids)}
+        vectors = build_vectors(rows, category_buckets)
+        existing = [i for i, row in enumerate(rows) if row[0] in positions]
+        if existing:
+            matrix[[positions[rows[i][0]] for i in existing]] = vectors[existing]
+        new = [i for i, row in enumerate(rows) if row[0] not in positions]
+        if new:
+            ids = np.concatenate([ids, np.array([rows[i][0] for i in new], dtype=np.int64)])
+            matrix = np.vstack([matrix, vectors[new]])
+
+        _save_index(ids, matrix, category_buckets, path)
+        return _set_index(ids, matrix, category_buckets, path)
+
+
+# Retorna o índice em memória, recarregando do disco se outro processo (ex: a ingestão) o atualizou
+def get_index(path=INDEX_PATH):
+    if not os.path.exists(path):
+        return build_index(path)
+    index = _index
+    if index is not None and index["path"] == path and index["mtime"] == os.path.getmtime(path):
+        return index
+    with _index_lock:
+        with np.load(path) as data:
+            if "category_buckets" in data:
+                return _set_index(data["ids"], data["matrix"], data["category_buckets"], path)
+    return build_index(path) # arquivo de uma versão anterior
+
+
+# Top-k vizinhos mais próximos pela similaridade do cosseno. Retorna [(book_id, score)] ou None se o livro não está no índice
+def most_similar(book_id, k=5, path=INDEX_PATH):
+    index = get_index(path)
+    position = index["positions"].get(book_id)
+    if position is None:
+        return None
+
+    scores = index["matrix"] @ index["matrix"][position]
+    scores[position] = -np.inf # o próprio livro não entra no resultado
+    k = min(k, len(scores) - 1)
+    if k <= 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k] # seleção parcial O(n) em vez de ordenar o catálogo inteiro
+    top = top[np.argsort(-scores[top])]
+    return [(int(index["ids"][i]), float(scores[i])) for i in top]
@@ -0,0 +1,138 @@
+import cProfile
+import io
+import json
+import pstats
+import time
+from contextlib import contextmanager
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler # opcional (extra "profiling")
+except ImportError:
+    PyinstrumentProfiler = None
+
+PHASES = ("fetch", "parse", "store")
+PROFILERS = ("cprofile", "pyinstrument")
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, round(pct / 100 * (len(values) - 1)))
+    return values[index]
+
+
+# Coleta as métricas do crawl por página: tempo de cada fase (fetch, parse, store), tempo até o servidor
+# responder os headers (server), bytes recebidos pela rede (bytes) e do corpo descomprimido (body_bytes), tentativas extras (retries) e livros extraídos.
+# Opcionalmente roda um profiler (cProfile ou pyinstrument) durante todo o crawl.
+class CrawlTelemetry:
+    def __init__(self, profiler=None, profile_output=None):
+        if profiler is not None and profiler not in PROFILERS:
+            raise ValueError(f"Profiler inválido: {profiler}. Use um de {PROFILERS}.")
+        if profiler == "pyinstrument" and PyinstrumentProfiler is None:
+            raise ValueError("pyinstrument não está instalado. Instale o extra 'profiling'.")
+        self.profiler_name = profiler
+        self.profile_output = profile_output
+        self.pages = []
+        self.started_at = None
+        self.finished_at = None
+        self._profiler = None
+        self._profile_text = None
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        if self.profiler_name == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profiler_name == "pyinstrument":
+            self._profiler = PyinstrumentProfiler()
+            self._profiler.start()
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+        if self.profiler_name == "cprofile":
+            self._profiler.disable()
+            if self.profile_output:
+                self._profiler.dump_stats(self.profile_output) # abrir com snakeviz ou pstats
+            stream = io.StringIO()
+            pstats.Stats(self._profiler, stream=stream).sort_stats("cumulative").print_stats(20)
+            self._profile_text = stream.getvalue()
+        elif self.profiler_name == "pyinstrument":
+            self._profiler.stop()
+            if self.profile_output:
+                with open(self.profile_output, "w") as f:
+                    f.write(self._profiler.output_html())
+            self._profile_text = self._profiler.output_text()
+
+    def start_page(self, url, category):
+        page = {
+            "url": url,
+            "category": category,
+            "fetch_s": 0.0,
+            "server_s": 0.0,
+            "parse_s": 0.0,
+            "store_s": 0.0,
+            "bytes": 0,
+            "body_bytes": 0,
+            "retries": 0,
+            "books": 0,
+        }
+        self.pages.append(page)
+        return page
+
+    @contextmanager
+    def span(self, page, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            page[f"{phase}_s"] += time.perf_counter() - start
+
+    def summary(self):
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        wall = end - self.started_at if self.started_at is not None else 0.0
+        total_books = sum(p["books"] for p in self.pages)
+
+        phases = {}
+        for phase in PHASES + ("server",):
+            values = [p[f"{phase}_s"] for p in self.pages]
+            phases[phase] = {
+                "total_s": round(sum(values), 4),
+                "mean_s": round(sum(values) / len(values), 4) if values else 0.0,
+                "p50_s": round(_percentile(values, 50), 4),
+                "p95_s": round(_percentile(values, 95), 4),
+                "max_s": round(max(values), 4) if values else 0.0,
+            }
+
+        slowest = sorted(self.pages, key=lambda p: p["fetch_s"] + p["parse_s"] + p["store_s"], reverse=True)[:5]
+        return {
+            "pages": len(self.pages),
+            "books": total_books,
+            "books_per_page": round(total_books / len(self.pages), 2) if self.pages else 0.0,
+            "books_per_second": round(total_books / wall, 2) if wall else 0.0,
+            "wall_time_s": round(wall, 4),
+            "bytes": sum(p["bytes"] for p in self.pages),
+            "body_bytes": sum(p["body_bytes"] for p in self.pages),
+            "retries": sum(p["retries"] for p in self.pages),
+            "phases": phases,
+            "slowest_pages": [p["url"] for p in slowest],
+            "profiler": self.profiler_name,
+        }
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump({"summary": self.summary(), "pages": self.pages}, f, indent=2, ensure_ascii=False)
+
+    def print_report(self):
+        summary = self.summary()
+        print("📊 Resumo do crawl")
+        print(f"  páginas: {summary['pages']} | livros: {summary['books']} ({summary['books_per_page']}/página)")
+        print(f"  tempo total: {summary['wall_time_s']:.2f}s | {summary['books_per_second']} livros/s")
+        print(f"  bytes recebidos: {summary['bytes']} (corpo descomprimido: {summary['body_bytes']}) | retries: {summary['retries']}")
+        for phase, stats in summary["phases"].items():
+            print(f"  {phase:<6} total {stats['total_s']:8.3f}s | média {stats['mean_s']:.4f}s | p95 {stats['p95_s']:.4f}s | máx {stats['max_s']:.4f}s")
+        print("  páginas mais lentas:")
+        for url in summary["slowest_pages"]:
+            print(f"    {url}")
+        if self._profile_text:
+            print(self._profile_text)
@@ -1,53 +1,121 @@
-from enum import Enum
-
-class CategoryEnum(str, Enum):
-    Ficção = "Ficção"
-    Travel = "Travel"
-    Mystery = "Mystery"
-    Historical_Fiction = "Historical Fiction"
-    Sequential_Art = "Sequential Art"
-    Classics = "Classics"
-    Philosophy = "Philosophy"
-    Romance = "Romance"
-    Womens_Fiction = "Womens Fiction"
-    Childrens = "Childrens"
-    Religion = "Religion"
-    Nonfiction = "Nonfiction"
-    Music = "Music"
-    Default = "Default"
-    Science_Fiction = "Science Fiction"
-    Sports_and_Games = "Sports and Games"
-    Add_a_comment = "Add a comment"
-    Fantasy = "Fantasy"
-    New_Adult = "New Adult"
-    Young_Adult = "Young Adult"
-    Science = "Science"
-    Poetry = "Poetry"
-    Paranormal = "Paranormal"
-    Art = "Art"
-    Psychology = "Psychology"
-    Autobiography = "Autobiography"
-    Parenting = "Parenting"
-    Adult_Fiction = "Adult Fiction"
-    Humor = "Humor"
-    Horror = "Horror"
-    History = "History"
-    Food_and_Drink = "Food and Drink"
-    Christian_Fiction = "Christian Fiction"
-    Business = "Business"
-    Biography = "Biography"
-    Thriller = "Thriller"
-    Contemporary = "Contemporary"
-    Spirituality = "Spirituality"
-    Academic = "Academic"
-    Self_Help = "Self Help"
-    Historical = "Historical"
-    Christian = "Christian"
-    Suspense = "Suspense"
-    Short_Stories = "Short Stories"
-    Novels = "Novels"
-    Health = "Health"
-    Politics = "Politics"
-    Cultural = "Cultural"
-    Erotica = "Erotica"
-    Crime = "Crime"
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import func
+
+from config_database import SessionLocal
+from models import Category, BookChange
+
+# Cache em memória da tabela de categorias (nome -> id e id -> nome).
+# É recarregado quando a ingestão faz commit, quando a listagem vê que o MAX(categories.id) do banco mudou
+# (outro processo ingeriu categorias novas) e, no máximo a cada CATEGORY_RELOAD_INTERVAL segundos,
+# quando chega uma categoria desconhecida.
+CATEGORY_RELOAD_INTERVAL = 5.0
+
+_category_lock = threading.Lock()
+_categories_by_name = {}
+_categories_by_id = {}
+_categories_loaded_at = None
+_categories_generation = None # maior id carregado; as categorias só são criadas, nunca removidas
+
+
+def refresh_categories(session=None):
+    global _categories_by_name, _categories_by_id, _categories_loaded_at, _categories_generation
+
+    own_session = session is None
+    if own_session:
+        session = SessionLocal()
+    try:
+        rows = session.query(Category.id, Category.name).order_by(Category.id).all()
+    finally:
+        if own_session:
+            session.close()
+
+    by_name = {name: category_id for category_id, name in rows}
+    by_id = {category_id: name for category_id, name in rows}
+    with _category_lock: # troca os dois dicionários de uma vez para as leituras nunca verem um estado parcial
+        _categories_by_name = by_name
+        _categories_by_id = by_id
+        _categories_loaded_at = time.monotonic()
+        _categories_generation = rows[-1][0] if rows else 0
+    return by_name
+
+
+def _ensure_categories_loaded():
+    if _categories_loaded_at is None:
+        refresh_categories()
+
+
+def get_category_id(name):
+    _ensure_categories_loaded()
+    category_id = _categories_by_name.get(name)
+    if category_id is None and time.monotonic() - _categories_loaded_at >= CATEGORY_RELOAD_INTERVAL:
+        category_id = refresh_categories().get(name)
+    return category_id
+
+
+def get_category_name(category_id):
+    _ensure_categories_loaded()
+    name = _categories_by_id.get(category_id)
+    if name is None and time.monotonic() - _categories_loaded_at >= CATEGORY_RELOAD_INTERVAL:
+        refresh_categories()
+        name = _categories_by_id.get(category_id)
+    return name
+
+
+def list_categories():
+    session = SessionLocal()
+    try:
+        generation = session.query(func.max(Category.id)).scalar() or 0
+        if generation != _categories_generation:
+            refresh_categories(session)
+    finally:
+        session.close()
+    return list(_categories_by_name) # já vem ordenado pelo id de inserção
+
+
+# Cache LRU por id dos livros já serializados, usado pela busca em lote.
+# Cada entrada pertence a uma geração: o maior id de book_changes, que cresce a cada livro criado ou alterado
+# pela ingestão (em qualquer processo). Quando a geração do banco muda, o cache é descartado.
+BOOK_CACHE_SIZE = 10000
+
+_book_cache_lock = threading.Lock()
+_book_cache = OrderedDict()
+_book_cache_generation = None
+
+
+def get_books_generation(session):
+    return session.query(func.max(BookChange.id)).scalar() or 0
+
+
+def get_cached_books(ids, generation):
+    global _book_cache_generation
+    found = {}
+    with _book_cache_lock:
+        if generation != _book_cache_generation:
+            _book_cache.clear()
+            _book_cache_generation = generation
+            return found
+        for book_id in ids:
+            book = _book_cache.get(book_id)
+            if book is not None:
+                _book_cache.move_to_end(book_id)
+                found[book_id] = book
+    return found
+
+
+def cache_books(books, generation):
+    with _book_cache_lock:
+        if generation != _book_cache_generation: # outra requisição já viu uma geração mais nova
+            return
+        for book in books:
+            _book_cache[book["id"]] = book
+            _book_cache.move_to_end(book["id"])
+        while len(_book_cache) > BOOK_CACHE_SIZE:
+            _book_cache.popitem(last=False)
+
+
+def clear_book_cache():
+    with _book_cache_lock:
+        _book_cache.clear()
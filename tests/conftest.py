@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# mesma solução do app/main.py: os módulos de scripts/ se importam sem o prefixo do pacote
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'scripts'))
+
+# banco e arquivos gerados (índice de similaridade, imagens) ficam em um diretório temporário,
+# nunca no books_production.db do repositório. Precisa ser definido antes do import do config_database.
+TEST_DIR = tempfile.mkdtemp(prefix="fiap-tcf1-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}"
+os.chdir(TEST_DIR)
+
+
+@pytest.fixture(scope="session")
+def database():
+    from insert_database import init_database
+    init_database()
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as client:
+        yield client
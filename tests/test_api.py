@@ -0,0 +1,55 @@
+def test_changes_feed_pages_with_since_and_limit(client):
+    start = client.get("/api/v1/changes", params={"since": 0, "limit": 5000}).json()
+    while start["possui mais"]:
+        start = client.get("/api/v1/changes", params={"since": start["próximo cursor"], "limit": 5000}).json()
+    cursor = start["próximo cursor"]
+
+    books = [
+        {"id": 20001 + i, "title": f"Livro {i}", "price": 10.0 + i, "category": "Travel", "rating": 3, "availability": "In stock", "image_url": None}
+        for i in range(3)
+    ]
+    client.post("/insert-books", json=books)
+    client.post("/insert-books", json=[dict(books[0], price=1.5)])
+
+    first = client.get("/api/v1/changes", params={"since": cursor, "limit": 6}).json()
+    assert first["total alterações"] == 6
+    assert first["possui mais"] is True
+    assert first["próximo cursor"] == first["alterações"][-1]["cursor"]
+    assert [(c["book_id"], c["field"], c["old_value"], c["new_value"]) for c in first["alterações"]] == [
+        (20001, "created", None, None),
+        (20001, "title", None, "Livro 0"),
+        (20001, "price", None, "10.0"),
+        (20001, "category", None, "Travel"),
+        (20001, "rating", None, "3"),
+        (20001, "availability", None, "In stock"),
+    ]
+
+    second = client.get("/api/v1/changes", params={"since": first["próximo cursor"], "limit": 5000}).json()
+    assert second["possui mais"] is False
+    assert [c["book_id"] for c in second["alterações"] if c["field"] == "created"] == [20002, 20003]
+    assert (second["alterações"][-1]["book_id"], second["alterações"][-1]["field"], second["alterações"][-1]["old_value"], second["alterações"][-1]["new_value"]) == (20001, "price", "10.0", "1.5")
+
+    empty = client.get("/api/v1/changes", params={"since": second["próximo cursor"]}).json()
+    assert empty == {"total alterações": 0, "alterações": [], "próximo cursor": second["próximo cursor"], "possui mais": False}
+
+
+def test_changes_feed_rejects_invalid_limit(client):
+    assert client.get("/api/v1/changes", params={"limit": 0}).status_code == 422
+
+
+def test_book_image_only_serves_allowed_content_types(client):
+    from config_database import SessionLocal
+    from images import store_image
+    from models import BookImage
+
+    client.post("/insert-books", json=[{"id": 20101, "title": "Capa antiga", "price": 10.0, "category": "Travel", "rating": 3, "availability": "In stock", "image_url": None}])
+    sha256 = store_image(b"<html><script>alert(1)</script></html>")
+    session = SessionLocal()
+    session.add(BookImage(book_id=20101, sha256=sha256, content_type="text/html", size=38)) # registro gravado antes da validação
+    session.commit()
+    session.close()
+
+    response = client.get("/api/v1/books/20101/image")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert response.headers["x-content-type-options"] == "nosniff"
@@ -0,0 +1,56 @@
+import sqlite3
+
+from config_database import DATABASE_URL
+
+
+def make_books(first_id, count):
+    return [
+        {"id": first_id + i, "title": f"Livro {i}", "price": 10.0, "category": "Travel", "rating": 3, "availability": "In stock", "image_url": None}
+        for i in range(count)
+    ]
+
+
+def batch(client, ids, **params):
+    return client.post("/api/v1/books/batch", json={"ids": ids}, params=params)
+
+
+def test_batch_keeps_request_order_with_duplicates_and_missing_ids(client):
+    client.post("/insert-books", json=make_books(40001, 3))
+
+    body = batch(client, [40003, 40001, 99999, 40003, 40002]).json()
+
+    assert [book["id"] for book in body["livros"]] == [40003, 40001, 40003, 40002]
+    assert body["total livros encontrados"] == 4
+    assert body["ids não encontrados"] == [99999]
+
+
+def test_batch_resolves_more_ids_than_one_sqlite_chunk(client):
+    client.post("/insert-books", json=make_books(41001, 1000))
+    ids = list(range(42000, 41000, -1)) # fora de ordem e acima do bloco de 900 parâmetros
+
+    for cache in ("false", "true", "true"): # sem cache, cache frio e cache quente
+        body = batch(client, ids, cache=cache).json()
+        assert [book["id"] for book in body["livros"]] == ids
+        assert body["ids não encontrados"] == []
+
+
+def test_batch_rejects_empty_or_too_many_ids(client):
+    assert batch(client, []).status_code == 400
+    assert batch(client, list(range(1, 10002))).status_code == 400
+    assert batch(client, list(range(1, 10001))).status_code == 200
+
+
+def test_batch_cache_follows_changes_made_by_another_process(client):
+    client.post("/insert-books", json=make_books(43001, 1))
+    assert batch(client, [43001]).json()["livros"][0]["price"] == 10.0
+
+    # outro processo altera o livro direto no banco
+    with sqlite3.connect(DATABASE_URL.replace("sqlite:///", "")) as conn:
+        conn.execute("UPDATE books SET price = 99.0 WHERE id = 43001")
+    assert batch(client, [43001], cache="false").json()["livros"][0]["price"] == 99.0
+    assert batch(client, [43001]).json()["livros"][0]["price"] == 10.0 # sem histórico a geração não muda
+
+    # toda escrita da ingestão registra o histórico, que avança a geração e descarta o cache
+    with sqlite3.connect(DATABASE_URL.replace("sqlite:///", "")) as conn:
+        conn.execute("INSERT INTO book_changes (book_id, field, old_value, new_value, changed_at) VALUES (43001, 2, '10.0', '99.0', '2026-01-01')")
+    assert batch(client, [43001]).json()["livros"][0]["price"] == 99.0
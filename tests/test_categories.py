@@ -0,0 +1,71 @@
+import sqlite3
+
+from sqlalchemy import create_engine, text
+
+from config_database import DATABASE_URL
+from insert_database import init_database, save_to_database
+from utils import list_categories
+
+
+def make_book(book_id, **fields):
+    book = {"id": book_id, "title": "Livro", "price": 10.0, "category": "Travel", "rating": 3, "availability": "In stock", "image_url": None}
+    book.update(fields)
+    return book
+
+
+def test_migrates_legacy_category_column_without_breaking_foreign_keys(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE books (
+                id INTEGER NOT NULL, title VARCHAR NOT NULL, price FLOAT NOT NULL, category VARCHAR NOT NULL,
+                rating INTEGER, availability VARCHAR, image_url VARCHAR, PRIMARY KEY (id)
+            )
+        """))
+        conn.execute(text("CREATE INDEX ix_books_id ON books (id)"))
+        conn.execute(text("""
+            INSERT INTO books VALUES
+                (1, 'A', 10.0, 'Travel', 3, 'In stock', NULL),
+                (2, 'B', 20.0, 'Mystery', 4, 'In stock', NULL),
+                (3, 'C', 30.0, 'Travel', 5, 'In stock', NULL)
+        """))
+
+    init_database(bind=engine)
+    init_database(bind=engine) # idempotente
+
+    with engine.connect() as conn:
+        columns = [row[1] for row in conn.execute(text("PRAGMA table_info(books)"))]
+        assert "category" not in columns and "category_id" in columns
+        assert conn.execute(text("SELECT id, name FROM categories ORDER BY id")).all() == [(1, "Travel"), (2, "Mystery")]
+        assert conn.execute(text("SELECT id, category_id FROM books ORDER BY id")).all() == [(1, 1), (2, 2), (3, 1)]
+        for table in ("book_images", "book_changes"):
+            sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = :name"), {"name": table}).scalar()
+            assert "REFERENCES books (id)" in sql
+        conn.execute(text("PRAGMA foreign_keys = ON"))
+        conn.execute(text("INSERT INTO book_changes (book_id, field, changed_at) VALUES (1, 0, '2026-01-01')"))
+        assert conn.execute(text("PRAGMA foreign_key_check")).all() == []
+    engine.dispose()
+
+
+def test_search_validates_category_against_the_table(client):
+    client.post("/insert-books", json=[make_book(30001, category="Categoria Nova")])
+
+    found = client.get("/api/v1/books/search", params={"category": "Categoria Nova"})
+    assert found.status_code == 200
+    assert [book["id"] for book in found.json()["livros"]] == [30001]
+    assert client.get("/api/v1/books/search", params={"category": "Não Existe"}).status_code == 422
+
+
+def test_invalid_books_do_not_create_categories(database):
+    result = save_to_database([make_book(30002, title=None, category="Orphan Cat"), make_book(30003, category=["a"])])
+
+    assert [failure["book"]["id"] for failure in result["failures"]] == [30002, 30003]
+    assert "Orphan Cat" not in list_categories()
+
+
+def test_list_categories_sees_categories_created_by_another_process(database):
+    list_categories()
+    with sqlite3.connect(DATABASE_URL.replace("sqlite:///", "")) as conn: # simula outro worker/scrapper
+        conn.execute("INSERT INTO categories (name) VALUES ('Criada Fora')")
+
+    assert "Criada Fora" in list_categories()
@@ -0,0 +1,99 @@
+import functools
+import hashlib
+import http.server
+import os
+import threading
+
+import pytest
+
+from images import download_book_images, store_image, image_path, generate_thumbnails
+
+# GIF 1x1 válido, com a cor do pixel variando para gerar conteúdos (e hashes) diferentes
+def gif(color):
+    return b"GIF87a\x01\x00\x01\x00\x81\x00\x00" + bytes([color] * 3) + b"\x00" * 9 + b",\x00\x00\x00\x00\x01\x00\x01\x00\x00\x08\x04\x00\x01\x04\x04\x00;"
+
+CAPA_A = gif(0)
+CAPA_B = gif(255)
+HTML = b"<html><script>alert(1)</script></html>"
+
+
+@pytest.fixture
+def fixture_server(tmp_path):
+    site = tmp_path / "site"
+    site.mkdir()
+    (site / "a.gif").write_bytes(CAPA_A)
+    (site / "copia-de-a.gif").write_bytes(CAPA_A)
+    (site / "b.gif").write_bytes(CAPA_B)
+    (site / "pagina.html").write_bytes(HTML)
+    (site / "falsa.gif").write_bytes(HTML)
+
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(site))
+    handler.log_message = lambda *args: None
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_store_image_is_content_addressed(tmp_path):
+    first = store_image(b"conteudo", str(tmp_path))
+    second = store_image(b"conteudo", str(tmp_path))
+
+    assert first == second == hashlib.sha256(b"conteudo").hexdigest()
+    with open(image_path(first, str(tmp_path)), "rb") as f:
+        assert f.read() == b"conteudo"
+    assert sum(len(files) for _, _, files in os.walk(tmp_path)) == 1
+
+
+def test_download_book_images_dedups_by_hash_and_reports_failures(fixture_server, tmp_path):
+    images_dir = str(tmp_path / "images")
+    books = [
+        {"id": 1, "image_url": fixture_server + "a.gif"},
+        {"id": 2, "image_url": fixture_server + "copia-de-a.gif"},
+        {"id": 3, "image_url": fixture_server + "b.gif"},
+        {"id": 4, "image_url": fixture_server + "a.gif"},
+        {"id": 5, "image_url": fixture_server + "nao-existe.gif"},
+        {"id": 7, "image_url": fixture_server + "pagina.html"},
+        {"id": 6, "image_url": None},
+    ]
+
+    result = download_book_images(books, images_dir, max_workers=4)
+
+    saved = {record["book_id"]: record for record in result["saved"]}
+    assert sorted(saved) == [1, 2, 3, 4]
+    assert saved[1]["sha256"] == saved[2]["sha256"] == saved[4]["sha256"] == hashlib.sha256(CAPA_A).hexdigest()
+    assert saved[3]["sha256"] == hashlib.sha256(CAPA_B).hexdigest()
+    assert saved[1]["size"] == len(CAPA_A)
+    assert saved[1]["content_type"] == "image/gif"
+
+    failures = {failure["book_id"]: failure["error"] for failure in result["failures"]}
+    assert sorted(failures) == [5, 7]
+    assert "404" in failures[5]
+    assert "text/html" in failures[7]
+
+    stored = [f for _, _, files in os.walk(images_dir) for f in files]
+    assert sorted(stored) == sorted({saved[1]["sha256"], saved[3]["sha256"]})
+
+
+def test_download_rejects_html_served_as_image(fixture_server, tmp_path):
+    pytest.importorskip("PIL")
+    result = download_book_images([{"id": 1, "image_url": fixture_server + "falsa.gif"}], str(tmp_path))
+
+    assert result["saved"] == []
+    assert "imagem válida" in result["failures"][0]["error"]
+
+
+def test_generate_thumbnails_reports_failures(tmp_path):
+    pytest.importorskip("PIL")
+    images_dir = str(tmp_path / "images")
+    thumbnails_dir = str(tmp_path / "thumbnails")
+    valid = store_image(CAPA_A, images_dir)
+    broken = store_image(HTML, images_dir) # gravado antes da validação, por exemplo
+
+    result = generate_thumbnails([valid, broken], images_dir, thumbnails_dir, max_workers=1)
+
+    assert result["generated"] == [valid]
+    assert [failure["sha256"] for failure in result["failures"]] == [broken]
+    assert os.path.exists(image_path(valid, thumbnails_dir))
+    assert not os.path.exists(image_path(broken, thumbnails_dir))
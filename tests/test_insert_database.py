@@ -0,0 +1,125 @@
+from datetime import datetime
+
+from sqlalchemy import text
+
+from config_database import SessionLocal
+from insert_database import diff_books, save_to_database
+from models import BookChange, CHANGE_FIELDS
+
+CHANGED_AT = datetime(2026, 1, 1)
+
+
+def make_row(book_id, **fields):
+    row = {"id": book_id, "title": "Livro", "price": 10.0, "category_id": 1, "rating": 3, "availability": "In stock", "image_url": None}
+    row.update(fields)
+    return row
+
+
+def make_book(book_id, **fields):
+    book = {"id": book_id, "title": "Livro", "price": 10.0, "category": "Travel", "rating": 3, "availability": "In stock", "image_url": None}
+    book.update(fields)
+    return book
+
+
+def current_of(*rows):
+    return {row["id"]: {k: v for k, v in row.items() if k != "id"} for row in rows}
+
+
+def history(book_id):
+    session = SessionLocal()
+    try:
+        rows = session.query(BookChange).filter(BookChange.book_id == book_id).order_by(BookChange.id).all()
+        return [(row.field, row.old_value, row.new_value) for row in rows]
+    finally:
+        session.close()
+
+
+def test_diff_books_new_book_is_inserted_with_created_change():
+    new_rows, changed_rows, changes = diff_books({}, [make_row(1)], CHANGED_AT)
+
+    assert new_rows == [make_row(1)]
+    assert changed_rows == []
+    assert all(c["book_id"] == 1 and c["old_value"] is None and c["changed_at"] == CHANGED_AT for c in changes)
+    assert [(c["field"], c["new_value"]) for c in changes] == [ # image_url vazio não gera linha
+        (CHANGE_FIELDS["created"], None),
+        (CHANGE_FIELDS["title"], "Livro"),
+        (CHANGE_FIELDS["price"], "10.0"),
+        (CHANGE_FIELDS["category_id"], "1"),
+        (CHANGE_FIELDS["rating"], "3"),
+        (CHANGE_FIELDS["availability"], "In stock"),
+    ]
+
+
+def test_diff_books_records_one_change_per_changed_field():
+    current = current_of(make_row(1))
+    new_rows, changed_rows, changes = diff_books(current, [make_row(1, price=8.5, availability="Out of stock")], CHANGED_AT)
+
+    assert new_rows == []
+    assert changed_rows == [make_row(1, price=8.5, availability="Out of stock")]
+    assert [(c["field"], c["old_value"], c["new_value"]) for c in changes] == [
+        (CHANGE_FIELDS["price"], "10.0", "8.5"),
+        (CHANGE_FIELDS["availability"], "In stock", "Out of stock"),
+    ]
+
+
+def test_diff_books_unchanged_book_is_a_no_op():
+    assert diff_books(current_of(make_row(1)), [make_row(1)], CHANGED_AT) == ([], [], [])
+
+
+def test_diff_books_duplicate_ids_compare_against_previous_version_in_batch():
+    current = current_of(make_row(1))
+    rows = [make_row(1, price=9.0), make_row(1, price=9.0), make_row(1, price=7.0), make_row(2), make_row(2, rating=5)]
+    new_rows, changed_rows, changes = diff_books(current, rows, CHANGED_AT)
+
+    assert new_rows == [make_row(2, rating=5)] # o livro novo é inserido já com a última versão
+    assert changed_rows == [make_row(1, price=7.0)]
+    assert [(c["book_id"], c["field"], c["old_value"], c["new_value"]) for c in changes] == [
+        (1, CHANGE_FIELDS["price"], "10.0", "9.0"),
+        (1, CHANGE_FIELDS["price"], "9.0", "7.0"),
+        (2, CHANGE_FIELDS["created"], None, None),
+        (2, CHANGE_FIELDS["title"], None, "Livro"),
+        (2, CHANGE_FIELDS["price"], None, "10.0"),
+        (2, CHANGE_FIELDS["category_id"], None, "1"),
+        (2, CHANGE_FIELDS["rating"], None, "3"),
+        (2, CHANGE_FIELDS["availability"], None, "In stock"),
+        (2, CHANGE_FIELDS["rating"], "3", "5"),
+    ]
+
+
+def test_save_to_database_coerces_types_so_reingest_is_a_no_op(database):
+    book = make_book(10001, price="36.94", rating="2")
+
+    first = save_to_database([book])
+    second = save_to_database([book])
+
+    assert len(first["changes"]) == 6 # "created" e os cinco campos preenchidos
+    assert second["changes"] == []
+    created = history(10001)
+    assert created[0] == (CHANGE_FIELDS["created"], None, None)
+    assert (CHANGE_FIELDS["price"], None, "36.94") in created
+    assert (CHANGE_FIELDS["rating"], None, "2") in created
+
+
+def test_save_to_database_records_failures_and_keeps_working(database):
+    result = save_to_database([make_book(10002, title=None), make_book(10003)])
+
+    assert [failure["book"]["id"] for failure in result["failures"]] == [10002]
+    assert [book["id"] for book in result["saved"]] == [10003]
+    assert save_to_database([make_book(10004)])["saved"][0]["id"] == 10004 # a sessão anterior não ficou com o lock do banco
+
+
+def test_save_to_database_image_change_invalidates_stored_image(database):
+    save_to_database([make_book(10005, image_url="http://exemplo/a.jpg")])
+    session = SessionLocal()
+    session.execute(text("INSERT INTO book_images (book_id, sha256, content_type, size) VALUES (10005, 'abc', 'image/jpeg', 1)"))
+    session.commit()
+    session.close()
+
+    save_to_database([make_book(10005, image_url="http://exemplo/b.jpg")])
+
+    session = SessionLocal()
+    try:
+        assert session.execute(text("SELECT COUNT(*) FROM book_images WHERE book_id = 10005")).scalar() == 0
+    finally:
+        session.close()
+    assert history(10005)[-1] == (CHANGE_FIELDS["image_url"], "http://exemplo/a.jpg", "http://exemplo/b.jpg")
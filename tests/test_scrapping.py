@@ -0,0 +1,76 @@
+import gzip
+import http.server
+import threading
+
+import pytest
+from bs4 import BeautifulSoup
+
+from scrapping import extract_books_from_page, fetch
+from telemetry import CrawlTelemetry
+
+HTML = b"<html><body>" + b"<p>livro</p>" * 500 + b"</body></html>"
+
+PRODUCT = """
+<article class="product_pod">
+    <div class="image_container"><a href="{href}"><img src="../../../../media/cache/2c/da/capa.jpg" alt="{title}"></a></div>
+    <p class="star-rating Three"></p>
+    <h3><a href="{href}" title="{title}">{title}</a></h3>
+    <div class="product_price"><p class="price_color">£51.77</p><p class="instock availability">In stock</p></div>
+</article>
+"""
+
+
+class GzipHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = gzip.compress(HTML)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def gzip_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), GzipHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_counts_wire_bytes_and_body_bytes(gzip_server):
+    telemetry = CrawlTelemetry()
+    page = telemetry.start_page(gzip_server, "Travel")
+
+    response = fetch(gzip_server, page)
+
+    assert response.content == HTML
+    assert page["bytes"] == len(gzip.compress(HTML))
+    assert page["body_bytes"] == len(HTML)
+    assert telemetry.summary()["body_bytes"] == len(HTML)
+
+
+def test_extract_books_uses_the_product_id_from_the_link():
+    soup = BeautifulSoup(
+        PRODUCT.format(href="../../../a-light-in-the-attic_1000/index.html", title="A Light in the Attic")
+        + PRODUCT.format(href="../../../sem-id/index.html", title="Sem id"),
+        "html.parser"
+    )
+
+    books = extract_books_from_page(soup, "Poetry")
+
+    assert books[0] == {
+        "id": 1000,
+        "title": "A Light in the Attic",
+        "price": 51.77,
+        "rating": 3,
+        "availability": "In stock",
+        "category": "Poetry",
+        "image_url": "https://books.toscrape.com/media/cache/2c/da/capa.jpg",
+    }
+    assert books[1]["id"] is None # rejeitado na validação da ingestão
@@ -0,0 +1,86 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from config_database import DATABASE_URL
+from insert_database import save_to_database
+from similarity import CATEGORY_BUCKETS, TITLE_FEATURES, build_index, build_vectors, category_buckets_for, most_similar, update_index
+
+
+def make_book(book_id, title, category="Travel", price=10.0):
+    return {"id": book_id, "title": title, "price": price, "category": category, "rating": 3, "availability": "In stock", "image_url": None}
+
+
+def execute(sql):
+    with sqlite3.connect(DATABASE_URL.replace("sqlite:///", "")) as conn: # escrita de outro processo, fora da ingestão
+        conn.execute(sql)
+
+
+def test_build_vectors_are_normalised_and_rank_similar_titles_first():
+    rows = [
+        (1, "Harry Potter and the Goblet of Fire", 1, 20.0, 4),
+        (2, "Harry Potter and the Order of the Phoenix", 1, 22.0, 4),
+        (3, "A Brief History of Time", 2, 50.0, 2),
+    ]
+    matrix = build_vectors(rows)
+
+    assert matrix.dtype == np.float32
+    assert matrix.shape == (3, TITLE_FEATURES + CATEGORY_BUCKETS + 2)
+    assert np.allclose(np.linalg.norm(matrix, axis=1), 1.0)
+    assert matrix[0] @ matrix[1] > matrix[0] @ matrix[2]
+
+
+def test_category_block_grows_instead_of_colliding():
+    assert category_buckets_for([1, CATEGORY_BUCKETS - 1]) == CATEGORY_BUCKETS
+    assert category_buckets_for([CATEGORY_BUCKETS]) == CATEGORY_BUCKETS * 2
+    rows = [(1, "Livro", 1, 10.0, 3), (2, "Livro", CATEGORY_BUCKETS + 1, 10.0, 3)]
+    with pytest.raises(ValueError):
+        build_vectors(rows)
+    matrix = build_vectors(rows, category_buckets_for([1, CATEGORY_BUCKETS + 1]))
+    assert matrix[0] @ matrix[1] < 0.99 # categorias diferentes não caem na mesma posição
+
+
+def test_update_index_rewrites_changed_rows_and_appends_new_books(database, tmp_path):
+    path = str(tmp_path / "book_vectors.npz")
+    save_to_database([
+        make_book(50001, "The Lord of the Rings"),
+        make_book(50002, "The Lord of the Flies"),
+        make_book(50003, "Cooking with Grandma"),
+    ])
+    index = build_index(path)
+    total = len(index["ids"])
+    assert most_similar(50001, 1, path)[0][0] == 50002
+
+    execute("UPDATE books SET title = 'The Lord of the Rings: The Two Towers' WHERE id = 50003")
+    save_to_database([make_book(50004, "Cooking with Grandpa")])
+    index = update_index([50003, 50004], path)
+
+    assert len(index["ids"]) == total + 1
+    assert most_similar(50001, 1, path)[0][0] == 50003
+    assert most_similar(50004, 1, path)[0][0] != 50003
+    assert most_similar(99999, 1, path) is None
+
+
+def test_update_index_rebuilds_when_a_category_does_not_fit(database, tmp_path):
+    path = str(tmp_path / "book_vectors.npz")
+    save_to_database([make_book(50011, "Categoria pequena")])
+    assert build_index(path)["category_buckets"] == CATEGORY_BUCKETS
+
+    execute(f"INSERT INTO categories (id, name) VALUES ({CATEGORY_BUCKETS + 10}, 'Categoria distante')")
+    execute(f"INSERT INTO books (id, title, price, category_id) VALUES (50012, 'Categoria distante', 10.0, {CATEGORY_BUCKETS + 10})")
+    index = update_index([50012], path)
+
+    assert index["category_buckets"] == CATEGORY_BUCKETS * 2
+    assert index["matrix"].shape[1] == TITLE_FEATURES + CATEGORY_BUCKETS * 2 + 2
+    assert 50011 in index["positions"] and 50012 in index["positions"]
+
+
+def test_similar_route_indexes_books_created_outside_the_ingestion(client):
+    book = client.post("/test-book").json()
+
+    response = client.get(f"/api/v1/books/{book['id']}/similar", params={"k": 3})
+
+    assert response.status_code == 200
+    assert response.json()["livro"]["id"] == book["id"]
+    assert client.get("/api/v1/books/999999/similar").status_code == 422